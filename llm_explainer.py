@@ -9,6 +9,7 @@ import asyncio
 import json
 from concurrent.futures import ThreadPoolExecutor
 import re
+from utility import AGENT_MAX_ITER, Deadline, kickoff_copy, partial_output, run_with_deadline, label_fallback, record_fallback_tier, speculate, record_speculation, speculation_hit_rate
 
 
 if load_dotenv('.env'):
@@ -42,6 +43,7 @@ agent_planner = Agent(
     helping users make informed decisions regarding their CPF-related inquiries.""",
     allow_delegation=True,
     verbose=True,
+    max_iter=AGENT_MAX_ITER,
 )
 
 agent_researcher = Agent(
@@ -52,6 +54,7 @@ agent_researcher = Agent(
     from reliable sources, including the CPF website.""",
     allow_delegation=False,
     verbose=True,
+    max_iter=AGENT_MAX_ITER,
 )
 
 agent_writer = Agent(
@@ -62,6 +65,7 @@ agent_writer = Agent(
     Always ensure to incorporate user feedback for continuous improvement.""",
     allow_delegation=False, 
     verbose=True, 
+    max_iter=AGENT_MAX_ITER,
 )
 
 # <---------------------------------- Creating Tasks ---------------------------------->
@@ -108,10 +112,67 @@ crew = Crew(
 # <---------------------------------- Caching Function ---------------------------------->
 @st.cache_data(show_spinner=False)  # Disable spinner for this cached function
 def get_cached_crew_output(topic):
-    result = crew.kickoff(inputs={"topic": topic})  # Call crew.kickoff()
+    result = kickoff_copy(crew, ("topic", topic), {"topic": topic})  # Call crew.kickoff() on a copy of the crew
     return result
 
 
+# Precomputed answers for common topics, served when the crew cannot answer within the deadline
+PRECOMPUTED_ANSWERS = {
+    "ordinary account": """\
+- The Ordinary Account (OA) can be used for housing, insurance, investment and education.
+- OA savings earn at least 2.5% interest a year, plus extra interest on the first $60,000 of combined CPF balances.
+- Part of every monthly CPF contribution goes into the OA, with a larger share for younger members.""",
+    "special account": """\
+- The Special Account (SA) is for old age and investment in retirement-related financial products.
+- SA savings earn at least 4% interest a year, plus extra interest on the first $60,000 of combined CPF balances.
+- Cash top-ups to the SA may qualify for tax relief of up to $8,000 a year.""",
+    "medisave account": """\
+- The MediSave Account (MA) is for hospitalisation expenses and approved medical insurance.
+- MA savings earn at least 4% interest a year, plus extra interest on the first $60,000 of combined CPF balances.
+- MA top-ups are capped by the Basic Healthcare Sum.""",
+    "retirement account": """\
+- The Retirement Account (RA) is created at age 55 using savings from the SA and OA.
+- RA savings earn at least 4% interest a year, plus extra interest, and fund monthly CPF LIFE payouts.
+- The amount set aside depends on the retirement sum you choose.""",
+}
+
+
+def precomputed_answer(topic):
+    # Match a precomputed answer whose topic is mentioned in the question
+    topic = topic.lower()
+    for key, answer in PRECOMPUTED_ANSWERS.items():
+        if key in topic:
+            return answer
+    return None
+
+
+# Likely follow-up topics, prefetched in the background while the user reads the current answer
+RELATED_TOPICS = {
+    "ordinary account": ["Using CPF for housing", "Special Account"],
+    "special account": ["CPF top up tax relief", "Retirement Account"],
+    "medisave account": ["Basic Healthcare Sum", "MediShield Life"],
+    "retirement account": ["CPF LIFE", "Retirement sums"],
+    "top up": ["CPF top up tax relief", "CPF Annual Limit"],
+    "housing": ["Ordinary Account", "Accrued interest on housing"],
+    "cpf life": ["Retirement Account", "CPF LIFE payout plans"],
+}
+
+
+def related_topics(topic):
+    # Follow-up topics for every keyword mentioned in the question, without repeats
+    follow_ups = []
+    for key, topics in RELATED_TOPICS.items():
+        if key in topic.lower():
+            follow_ups += [t for t in topics if t not in follow_ups and t.lower() != topic.lower()]
+    return follow_ups[:3]
+
+
+def ask_topic(topic):
+    # Fill in the question with a follow-up topic and generate its answer on the next rerun
+    st.session_state.topic_input = topic
+    st.session_state.generate_requested = True
+
+
 # <---------------------------------- Streamlit UI ---------------------------------->
 
 # Function to sanitize input
@@ -157,23 +218,48 @@ def main_explainer():
     st.title("CPF Policy Simplifier")
 
     # User input for the topic
-    raw_topic = st.text_input("Ask about a CPF policy (e.g., 'What is the Ordinary Account?'): ")
+    raw_topic = st.text_input("Ask about a CPF policy (e.g., 'What is the Ordinary Account?'): ", key="topic_input")
 
     # Session state to handle results and flags
     if "generated_content" not in st.session_state:
         st.session_state.generated_content = ""
 
     # Button to generate content
-    if st.button("Generate Content"):
+    if st.button("Generate Content") or st.session_state.pop("generate_requested", False):
 
         # Sanitize the input
         topic = sanitize_input(raw_topic)
 
         if topic.strip():  # Check if the user input is not empty
             with st.spinner("Generating content, please wait..."):
-                result = get_cached_crew_output(topic)  # Run crew with caching
+                # Reuse the prefetched answer if this topic was a likely follow-up of the previous one
+                prefetch = st.session_state.get("simplifier_prefetch")
+                generate = lambda: get_cached_crew_output(topic)  # Run crew with caching
+                if prefetch is not None and prefetch.has(topic):
+                    record_speculation("simplifier", prefetch.ready(topic))
+                    if prefetch.claim(topic):
+                        generate = lambda: prefetch.result(topic)
+
+                result, tier = run_with_deadline(
+                    generate,
+                    Deadline(),
+                    [("cache", lambda: precomputed_answer(topic)), ("partial", lambda: partial_output(("topic", topic)))],
+                )
+                record_fallback_tier("simplifier", tier)
+                if result is None:
+                    result = "Sorry, we could not generate an answer in time. Please try again shortly."
+                result = label_fallback(result, tier)
                 st.session_state.generated_content = result  # Store result in session state
 
+            # Prefetch likely follow-up topics at low priority, cancelling prefetches for the previous topic
+            st.session_state.related_topics = related_topics(topic)
+            speculate(
+                "simplifier_prefetch",
+                topic,
+                [(t, lambda t=t: get_cached_crew_output(t)) for t in st.session_state.related_topics],
+                low_priority=True,
+            )
+
             # Display the final answer
             #st.markdown(result)
                 
@@ -181,6 +267,16 @@ def main_explainer():
     if "generated_content" in st.session_state and st.session_state.generated_content:
         st.markdown(st.session_state.generated_content)
 
+        # Suggest the prefetched follow-up topics
+        if st.session_state.get("related_topics"):
+            st.write("Related topics:")
+            for related_topic in st.session_state.related_topics:
+                st.button(related_topic, on_click=ask_topic, args=(related_topic,))
+
+        # Report how often a follow-up question was answered from the prefetch
+        if speculation_hit_rate("simplifier"):
+            st.caption(f"Prefetched follow-up topics {speculation_hit_rate('simplifier')}")
+
     # Feedback Section
     if st.session_state.generated_content:
         
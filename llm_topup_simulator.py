@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 from crewai_tools import WebsiteSearchTool
 from crewai import Agent, Task, Crew
 import asyncio
+from utility import AGENT_MAX_ITER, Deadline, kickoff_copy, partial_output, run_with_deadline, label_fallback, record_fallback_tier, speculate, record_speculation, speculation_hit_rate
 
 
 if load_dotenv('.env'):
@@ -46,8 +47,7 @@ agent_calculate_limits = Agent(
     backstory="Use the contribution calculated and take note of the CPF Annual Limit (voluntary top-up limit) amount stated in CPF website. The maximum amount you can voluntarily top up is the difference between the CPF Annual Limit and the mandatory CPF contributions made for the calendar year.",
     allow_delegation=False,
     verbose=True,
-    max_iterations=20,  # Increase iteration limit
-    max_time_limit=180,  # Increase time limit (in seconds)
+    max_iter=AGENT_MAX_ITER,
     tools=[tool_websearch_cpf_service],
 )
 
@@ -58,8 +58,7 @@ agent_get_rates = Agent(
     backstory="Gather accurate tax relief percentage and interest rates from CPF and IRAS websites for each CPF account. Calculate how much tax is saved and how much interest is earned based on the user's top-up inputs.",
     allow_delegation=False,
     verbose=True,
-    max_iterations=20,  # Increase iteration limit
-    max_time_limit=120,  # Increase time limit (in seconds)
+    max_iter=AGENT_MAX_ITER,
     tools=[tool_websearch_cpf_member, tool_websearch_iras],  # Add the tools for CPF and IRAS searches
 )
 
@@ -144,6 +143,66 @@ crew_topup = Crew(
 )
 
 
+# <---------------------------------- Deterministic Calculator ---------------------------------->
+
+# CPF rules used when the crews cannot answer within the request deadline
+OW_CEILING = 6800            # Monthly Ordinary Wage ceiling
+ANNUAL_SALARY_CEILING = 102000
+CPF_ANNUAL_LIMIT = 37740     # Mandatory + voluntary contributions cap per calendar year
+
+# (max age, total contribution rate, OA/SA/MA share of the contribution)
+CONTRIBUTION_RATES = [
+    (35, 0.37, (0.6217, 0.1621, 0.2162)),
+    (45, 0.37, (0.5677, 0.1891, 0.2432)),
+    (50, 0.37, (0.5136, 0.2162, 0.2702)),
+    (55, 0.37, (0.4055, 0.3108, 0.2837)),
+    (60, 0.31, (0.3548, 0.2903, 0.3549)),
+    (65, 0.22, (0.1591, 0.2955, 0.5454)),
+    (70, 0.165, (0.0607, 0.1518, 0.7875)),
+    (200, 0.125, (0.08, 0.08, 0.84)),
+]
+
+# Annual interest rates for each CPF account
+INTEREST_RATES = {
+    "Ordinary Account": 0.025,
+    "Special Account": 0.04,
+    "Medisave Account": 0.04,
+}
+
+
+def estimate_contributions(user_inputs):
+    # Apply the OW ceiling and the annual salary ceiling to get the wages subject to CPF
+    annual_ow = min(user_inputs["ordinary_wage"], OW_CEILING) * 12
+    additional_wage = max(user_inputs["annual_income"] - user_inputs["ordinary_wage"] * 12, 0)
+    annual_aw = min(additional_wage, max(ANNUAL_SALARY_CEILING - annual_ow, 0))
+
+    for max_age, rate, shares in CONTRIBUTION_RATES:
+        if user_inputs["current_age"] <= max_age:
+            break
+    total = (annual_ow + annual_aw) * rate
+    oa, sa, ma = (total * share for share in shares)
+    return {"OA": oa, "SA": sa, "MA": ma, "Total": total}
+
+
+def format_contributions(user_inputs):
+    contributions = estimate_contributions(user_inputs)
+    return "\n".join(f"- **{account}:** ${amount:,.2f}" for account, amount in contributions.items())
+
+
+def format_limits(user_inputs):
+    total = estimate_contributions(user_inputs)["Total"]
+    return f"- **Total Available Top-Up:** ${max(CPF_ANNUAL_LIMIT - total, 0):,.2f}"
+
+
+def format_interest(topup_inputs):
+    lines = [
+        f"- **{item['cpf_account']}:** ${item['topup_amount'] * INTEREST_RATES[item['cpf_account']]:,.2f} interest earned"
+        for item in topup_inputs
+    ]
+    lines.append("- Tax savings depend on your chargeable income and are not estimated here.")
+    return "\n".join(lines)
+
+
 # <---------------------------------- Streamlit UI ---------------------------------->
 
 
@@ -179,17 +238,44 @@ def introduction():
 
 @st.cache_data
 def calculate_contributions(user_inputs):
-    return crew_contributions.kickoff(inputs={"user_inputs": user_inputs})
+    return kickoff_copy(crew_contributions, ("contributions", str(user_inputs)), {"user_inputs": user_inputs})
 
 @st.cache_data
 def calculate_limits(user_inputs):
-    return crew.kickoff(inputs={"user_inputs": user_inputs})
-
-async def async_calculate(user_inputs):
-    # Perform both calculations
-    contributions = await asyncio.to_thread(calculate_contributions, user_inputs)
-    limits = await asyncio.to_thread(calculate_limits, user_inputs)
-    return contributions, limits
+    return kickoff_copy(crew, ("limits", str(user_inputs)), {"user_inputs": user_inputs})
+
+def calculate_savings(topup_inputs):
+    return kickoff_copy(crew_topup, ("topup", str(topup_inputs)), {"topup_inputs": topup_inputs})
+
+def speculative_stage(speculation, name, calculate, user_inputs):
+    # Reuse the speculative result if it is ready or in flight for these inputs, otherwise calculate now
+    if speculation is not None and speculation.has(name):
+        record_speculation("calculator", speculation.ready(name))
+        if speculation.claim(name):
+            return lambda: speculation.result(name)
+    return lambda: calculate(user_inputs)
+
+async def async_calculate(user_inputs, deadline, speculation=None):
+    # Perform both calculations, sharing one deadline across the whole pipeline
+    contributions, contributions_tier = await asyncio.to_thread(
+        run_with_deadline,
+        speculative_stage(speculation, "contributions", calculate_contributions, user_inputs),
+        deadline,
+        [("calculator", lambda: format_contributions(user_inputs))],
+    )
+    limits, limits_tier = await asyncio.to_thread(
+        run_with_deadline,
+        speculative_stage(speculation, "limits", calculate_limits, user_inputs),
+        deadline,
+        [
+            # The limits task output is the actual top-up limit, so prefer it over the calculator estimate
+            ("partial", lambda: partial_output(("limits", str(user_inputs)), [task_calculate_limits])),
+            ("calculator", lambda: format_limits(user_inputs)),
+        ],
+    )
+    record_fallback_tier("calculator_contributions", contributions_tier)
+    record_fallback_tier("calculator_limits", limits_tier)
+    return label_fallback(contributions, contributions_tier), label_fallback(limits, limits_tier)
 
 def main_simulator():
     # Introduction
@@ -213,6 +299,19 @@ def main_simulator():
         "annual_income": annual_income
     }
 
+    # Start calculating in the background once every input is filled in and has settled, so the results
+    # are ready (or in flight) by the time the user clicks "Calculate Contributions"
+    speculation = None
+    if ordinary_wage > 0 and annual_income > 0:
+        speculation = speculate(
+            "calculator_speculation",
+            (current_age, ordinary_wage, annual_income),
+            [
+                ("contributions", lambda: calculate_contributions(user_inputs)),
+                ("limits", lambda: calculate_limits(user_inputs)),
+            ],
+        )
+
     # Session state to handle results and flags
     if "contribution_result" not in st.session_state:
         st.session_state.contribution_result = ""
@@ -223,7 +322,7 @@ def main_simulator():
     if st.button("Calculate Contributions"):
         with st.spinner("Calculating your contributions & top-up limit..."):
             # Await the async calculations
-            contribution_result, limits_result = asyncio.run(async_calculate(user_inputs))
+            contribution_result, limits_result = asyncio.run(async_calculate(user_inputs, Deadline(), speculation))
 
         # Display results
         #st.markdown(contribution_result)
@@ -242,6 +341,10 @@ def main_simulator():
         st.markdown(st.session_state.contribution_result)
         st.markdown(st.session_state.limits_result)
 
+        # Report how often background precomputation was ready in time
+        if speculation_hit_rate("calculator"):
+            st.caption(f"Precomputed results {speculation_hit_rate('calculator')}")
+
     # Show second input section only if contributions are calculated
     if st.session_state.calculated:
         st.markdown("---")
@@ -262,7 +365,13 @@ def main_simulator():
         if st.button("Calculate Savings & Interest"):
             with st.spinner("Calculating your savings & interest earned..."):
                 topup_inputs = [{"cpf_account": account, "topup_amount": amount} for account, amount in topup_amounts.items()]
-                savings_interest_result = crew_topup.kickoff(inputs={"topup_inputs": topup_inputs})
+                savings_interest_result, tier = run_with_deadline(
+                    lambda: calculate_savings(topup_inputs),
+                    Deadline(),
+                    [("calculator", lambda: format_interest(topup_inputs))],
+                )
+                record_fallback_tier("calculator_topup", tier)
+                savings_interest_result = label_fallback(savings_interest_result, tier)
 
             # Display results
             st.markdown(savings_interest_result)
@@ -44,6 +44,24 @@ def main_methodology():
     """)
     st.write("")
 
+    # Deadline & Fallback Section
+    st.subheader("Response Deadline & Fallbacks")
+    st.write("""
+    - Every request has an end-to-end time budget shared by all the agents it runs, so users are never left waiting for minutes.
+    - When the budget is nearly spent, the system returns the best answer available: a precomputed answer for common topics, an estimate from the built-in CPF calculator, or the partial output of the tasks completed so far.
+    - Fallback answers are clearly labelled, and the tier that served each request is recorded.
+    """)
+    st.write("")
+
+    # Speculative Precomputation Section
+    st.subheader("Speculative Precomputation")
+    st.write("""
+    - Once all calculator inputs are filled in and stop changing, contributions and top-up limits start calculating in the background, so results are often ready before the user clicks "Calculate Contributions".
+    - After the Policy Simplifier answers a question, likely follow-up topics are prefetched at low priority and suggested to the user.
+    - When the inputs or topic change, speculative work that has not started yet is cancelled; a stage already running cannot be interrupted and finishes in the background. Each session can only have a limited number of speculations running at once. The hit rate, i.e. how often a speculated result was already ready when the user asked for it, is shown below the results.
+    """)
+    st.write("")
+
     # Multi-Agent System Section
     st.subheader("Multi-Agent System")
     st.write("""
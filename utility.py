@@ -1,6 +1,9 @@
 import streamlit as st  
 import random  
 import hmac  
+import time
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 # """  
 # This file contains the common components used in the Streamlit App.  
@@ -27,3 +30,244 @@ def check_password():
     if "password_correct" in st.session_state:  
         st.error("😕 Password incorrect")  
     return False
+
+
+# <---------------------------------- Deadline & Fallbacks ---------------------------------->
+
+# End-to-end time budget (in seconds) for one user request, across every crew it runs
+REQUEST_DEADLINE = 45
+# Stop waiting on the crews this many seconds before the budget is spent, to leave time for the fallback
+DEADLINE_MARGIN = 3
+
+# Maximum reasoning iterations per agent, the limit crewai enforces on a running crew
+AGENT_MAX_ITER = 5
+# Maximum live crews running at once, including ones still finishing after their request's deadline
+MAX_LIVE_RUNS = 8
+_live_run_slots = threading.BoundedSemaphore(MAX_LIVE_RUNS)
+
+# Crews currently running, by key, so a timed-out request can read their partial output
+running_crews = {}
+
+
+class Deadline:
+    """Tracks the remaining time budget of a single user request."""
+    def __init__(self, budget=REQUEST_DEADLINE):
+        self.budget = budget
+        self.start = time.monotonic()
+
+    def remaining(self):
+        return self.budget - (time.monotonic() - self.start)
+
+    def expired(self):
+        return self.remaining() <= DEADLINE_MARGIN
+
+
+def kickoff_copy(crew, key, inputs):
+    """Kicks off a copy of `crew` so concurrent runs do not share agent and task state."""
+    crew_copy = crew.copy()
+    running_crews[key] = (crew, crew_copy)
+    try:
+        return crew_copy.kickoff(inputs=inputs)
+    finally:
+        running_crews.pop(key, None)
+
+
+def partial_output(key, tasks=None):
+    """Returns the output of the tasks that finished before the deadline in the crew running under `key`.
+
+    `tasks` restricts this to the given tasks of the original crew.
+    """
+    if key not in running_crews:
+        return None
+    crew, crew_copy = running_crews[key]
+    wanted = None if tasks is None else {id(task) for task in tasks}
+    outputs = [
+        copied.output.raw
+        for task, copied in zip(crew.tasks, crew_copy.tasks)
+        if copied.output is not None and (wanted is None or id(task) in wanted)
+    ]
+    return "\n\n".join(outputs)
+
+
+def _start_live_run(fn):
+    # Each live run gets its own thread, so crews that overrun in other requests never delay this one.
+    # The slots cap how many can pile up; returns None when they are all taken.
+    if not _live_run_slots.acquire(blocking=False):
+        return None
+    future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            _live_run_slots.release()
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def run_with_deadline(fn, deadline, fallbacks):
+    """Runs `fn` within the request deadline and returns `(result, tier)`.
+
+    If `fn` fails, does not finish in time, or all live run slots are taken, each
+    `(tier, fallback)` pair is tried in order and the first non-empty answer is
+    returned together with the tier that served it.
+    """
+    future = None if deadline.expired() else _start_live_run(fn)
+    if future is not None:
+        try:
+            return future.result(timeout=deadline.remaining() - DEADLINE_MARGIN), "live"
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            print(f"Live run failed, falling back: {e}")
+    elif not deadline.expired():
+        print("Live run limit reached, falling back")
+
+    for tier, fallback in fallbacks:
+        answer = fallback()
+        if answer:
+            return answer, tier
+    return None, "none"
+
+
+def label_fallback(answer, tier):
+    """Prefixes a fallback answer with a notice so users know it is not the full result."""
+    notices = {
+        "cache": "This is a precomputed answer, served because the full response took too long.",
+        "calculator": "This is an estimate from the built-in calculator, served because the full response took too long.",
+        "partial": "This is a partial answer, served because the full response took too long.",
+    }
+    if tier not in notices:
+        return answer
+    return f"> ⚠️ {notices[tier]}\n\n{answer}"
+
+
+def record_fallback_tier(page, tier):
+    """Records which fallback tier served a request, for the current session and the server log."""
+    if "served_tiers" not in st.session_state:
+        st.session_state.served_tiers = []
+    st.session_state.served_tiers.append({"page": page, "tier": tier})
+    print(f"[{page}] request served by tier: {tier}")
+
+
+# <---------------------------------- Speculative Precomputation ---------------------------------->
+
+# Seconds the inputs must stay unchanged before speculative work starts
+SPECULATION_DEBOUNCE = 1.5
+
+# Speculations each session may have running at once, counting stale ones still finishing a stage;
+# low priority prefetches get a single slot so they run one at a time
+SPECULATION_SESSION_LIMIT = 2
+PREFETCH_SESSION_LIMIT = 1
+
+
+class Speculation:
+    """Runs named stages one after another on a background thread, after a debounce delay.
+
+    Each stage result is exposed as a Future so a request can reuse work that is
+    already done or still in flight. Cancelling skips any stage not yet started;
+    a stage already running finishes in the background.
+    """
+    def __init__(self, key, stages):
+        self.key = key
+        self.cancelled = threading.Event()
+        self.stages = {name: Future() for name, _ in stages}
+        self.thread = threading.Thread(target=self._run, args=(stages,), daemon=True)
+        self.thread.start()
+
+    def _run(self, stages):
+        # Wait for the inputs to settle; a newer speculation cancels this one meanwhile
+        if self.cancelled.wait(SPECULATION_DEBOUNCE):
+            return
+        for name, fn in stages:
+            if self.cancelled.is_set() or not self.stages[name].set_running_or_notify_cancel():
+                continue
+            try:
+                self.stages[name].set_result(fn())
+            except Exception as e:
+                print(f"Speculative stage {name} failed: {e}")
+                self.stages[name].set_exception(e)
+
+    def active(self):
+        # Still using (or about to use) a crew: not yet cancelled, or cancelled mid-stage
+        if not self.thread.is_alive():
+            return False
+        return not self.cancelled.is_set() or any(future.running() for future in self.stages.values())
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self.stages.values():
+            future.cancel()
+
+    def has(self, name):
+        return name in self.stages and not self.stages[name].cancelled()
+
+    def ready(self, name):
+        return self.has(name) and self.stages[name].done() and self.stages[name].exception() is None
+
+    def claim(self, name):
+        """Returns True if a request can reuse this stage, i.e. it succeeded or is still running.
+
+        A stage still waiting behind other work is cancelled so the request runs it live
+        instead of queueing behind stale speculation; a failed stage is recalculated live.
+        """
+        if not self.has(name):
+            return False
+        future = self.stages[name]
+        if future.cancel():
+            return False
+        return future.running() or future.exception() is None
+
+    def result(self, name):
+        return self.stages[name].result()
+
+
+def speculate(session_key, key, stages, low_priority=False):
+    """Starts speculative work for `key`, cancelling any speculation for stale inputs.
+
+    The speculation is kept in session state under `session_key`, so repeated reruns
+    with the same inputs reuse it instead of starting the work again. Returns None
+    without starting anything while the session already has its limit of speculations
+    running; a later rerun tries again.
+    """
+    speculation = st.session_state.get(session_key)
+    if speculation is not None and speculation.key == key:
+        return speculation
+    if speculation is not None:
+        speculation.cancel()
+    st.session_state[session_key] = None
+
+    running_key = f"{session_key}_running"
+    running = [s for s in st.session_state.get(running_key, []) if s.active()]
+    limit = PREFETCH_SESSION_LIMIT if low_priority else SPECULATION_SESSION_LIMIT
+    if len(running) >= limit:
+        st.session_state[running_key] = running
+        print(f"[{session_key}] speculation limit reached, skipping")
+        return None
+
+    speculation = Speculation(key, stages)
+    st.session_state[running_key] = running + [speculation]
+    st.session_state[session_key] = speculation
+    return speculation
+
+
+def record_speculation(page, hit):
+    """Records whether speculative work was ready when the user asked for it, for the session and the server log."""
+    if "speculation_stats" not in st.session_state:
+        st.session_state.speculation_stats = {}
+    stats = st.session_state.speculation_stats.setdefault(page, {"hits": 0, "misses": 0})
+    stats["hits" if hit else "misses"] += 1
+    print(f"[{page}] speculation {'hit' if hit else 'miss'}, {speculation_hit_rate(page)}")
+
+
+def speculation_hit_rate(page):
+    """Returns the session's speculation hit rate for `page` as text, or None if nothing was speculated yet."""
+    stats = st.session_state.get("speculation_stats", {}).get(page)
+    if not stats:
+        return None
+    total = stats["hits"] + stats["misses"]
+    return f"hit rate: {stats['hits'] / total:.0%} ({stats['hits']}/{total})"